@@ -1,10 +1,28 @@
 import os
 import sys
 import json
+import asyncio
+import logging
+import argparse
 import subprocess
-import requests
-from bs4 import BeautifulSoup
+import contextlib
+import importlib.util
+import aiohttp
+from lxml import etree
+from lxml import html as lxml_html
 import re
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时退回标准库 json
+    orjson = None
+
+try:
+    import hyperscan
+except ImportError:  # 未安装 hyperscan 时退回 _BLOCK_RE
+    hyperscan = None
 
 
 ROOT_URL = "https://www.bonghwa.co.kr/"
@@ -13,17 +31,69 @@ LIST_URLS = [
     (7, "https://www.bonghwa.co.kr/listing.cfm?cat=7"),
 ]
 COOKIES_FILE = "bonghwa_cookies.json"  # 由清除脚本输出
+SAVE_HTML = os.environ.get("BONGHWA_SAVE_HTML") == "1"  # 仅调试时保存完整 HTML
+_PHONE_RE = re.compile(r'0\d{1,2}-\d{3,4}-\d{4}')
+_CF_CACHE: dict = {}  # 按 cookie 文件 mtime 缓存 load_cf_info 的结果
+# 更严格的 Cloudflare 拦截识别，避免 "cdnjs.cloudflare.com" 造成误判；单次扫描，无需先 lower() 复制整页
+_BLOCK_KEYWORDS = (
+    b"attention required",
+    b"just a moment",
+    b"checking your browser",
+    b"please verify you are a human",
+    b"cf-error",
+    b"captcha",
+)
+_BLOCK_RE = re.compile(b"|".join(map(re.escape, _BLOCK_KEYWORDS)), re.IGNORECASE)
+# 安装了 hyperscan 时用其多模式 DFA 一遍扫描整页，关键词增多也不会变慢
+_BLOCK_DB = None
+if hyperscan is not None:
+    _BLOCK_DB = hyperscan.Database()
+    _BLOCK_DB.compile(
+        expressions=list(_BLOCK_KEYWORDS),
+        ids=list(range(len(_BLOCK_KEYWORDS))),
+        elements=len(_BLOCK_KEYWORDS),
+        flags=hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH,
+        literal=True,  # 关键词按字面匹配，与 _BLOCK_RE 中 re.escape 的语义一致
+    )
+# 站点页面均为 UTF-8，解析字节时固定编码，避免 libxml2 按其它编码猜测
+_HTML_PARSER = lxml_html.HTMLParser(encoding="utf-8")
 
 
-def run_cf_clearance_scraper(root_url: str, output_file: str, headed: bool = True, timeout: int = 30) -> None:
-    """调用 cf-clearance-scraper/main.py，生成包含 cf_clearance 与 UA 的 JSON 文件。"""
-    cf_script = os.path.join(os.path.dirname(__file__), "cf-clearance-scraper", "main.py")
+# 预编译 XPath，两个分类页共用；按 class 词元精确匹配（等价于 CSS 的 .col-lg-9 等）
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+_LEFT_XPATH = etree.XPath(
+    f"//div[{_has_class('col-lg-9')} and {_has_class('col-md-8')} and {_has_class('col-sm-8')}]"
+)
+_CAT_XPATH = etree.XPath(f".//span[{_has_class('cattxt')}]")
+_NEW_XPATH = etree.XPath(".//img[contains(@src, 'icn_new')]")
+_RIGHT_XPATH = etree.XPath(f"following-sibling::div[{_has_class('col-lg-3')}][1]")
+# 与 BS4 的 get_text 一致：跳过 <script>/<style> 内的文本
+_TEXT_XPATH = etree.XPath(".//text()[not(ancestor::script or ancestor::style)]")
+
+
+def _cf_script_path() -> str:
+    cf_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cf-clearance-scraper", "main.py")
     if not os.path.exists(cf_script):
         raise FileNotFoundError(f"未找到清除脚本: {cf_script}")
+    return cf_script
+
+
+def _load_cf_module():
+    """按路径加载 cf-clearance-scraper/main.py（目录名含连字符，无法直接 import）。"""
+    spec = importlib.util.spec_from_file_location("cf_clearance_scraper", _cf_script_path())
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
 
+def run_cf_clearance_scraper(root_url: str, output_file: str, headed: bool = True, timeout: int = 30) -> None:
+    """以子进程方式调用 cf-clearance-scraper/main.py，生成包含 cf_clearance 与 UA 的 JSON 文件。"""
     args = [
         sys.executable,
-        cf_script,
+        _cf_script_path(),
         root_url,
         "--file",
         output_file,
@@ -38,16 +108,93 @@ def run_cf_clearance_scraper(root_url: str, output_file: str, headed: bool = Tru
     subprocess.run(args, check=True)
 
 
+class ClearanceRefresher:
+    """
+    按需获取/刷新 cf_clearance，结果写入 cookie 文件供下次复用。
+
+    默认在进程内调用清除脚本的 run_solver：首次需要时才启动浏览器，之后在整个 main()
+    内复用同一个 CloudflareSolver，刷新时无需再次冷启动 Python 解释器与 Chrome。
+    use_subprocess=True 时退回旧的子进程方式。
+    """
+
+    def __init__(
+        self,
+        root_url: str,
+        output_file: str,
+        headed: bool = True,
+        timeout: int = 30,
+        use_subprocess: bool = False,
+    ) -> None:
+        self._root_url = root_url
+        self._output_file = output_file
+        self._headed = headed
+        self._timeout = timeout
+        self._use_subprocess = use_subprocess
+        self._stack = contextlib.AsyncExitStack()
+        self._cf = None
+        self._solver = None
+
+    async def __aenter__(self) -> "ClearanceRefresher":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._stack.aclose()
+
+    async def _get_solver(self):
+        if self._solver is None:
+            self._cf = _load_cf_module()
+            print(f"启动浏览器以获取 cf_clearance：{self._root_url}")
+            self._solver = await self._stack.enter_async_context(
+                self._cf.CloudflareSolver(
+                    user_agent=None,
+                    timeout=self._timeout,
+                    http2=True,
+                    http3=True,
+                    headless=not self._headed,
+                    proxy=None,
+                )
+            )
+        return self._solver
+
+    async def refresh(self) -> dict:
+        """获取新的 cf_clearance，写入 cookie 文件并返回其最新条目。"""
+        if self._use_subprocess:
+            await asyncio.to_thread(
+                run_cf_clearance_scraper, self._root_url, self._output_file, self._headed, self._timeout
+            )
+            return load_cf_info(self._output_file)
+
+        reused = self._solver is not None
+        solver = await self._get_solver()
+        if reused:
+            # 复用的浏览器仍持有上次取得、刚被拒绝的 cf_clearance；清空后重新求解，
+            # 相当于以前每次刷新都使用全新的浏览器配置
+            await solver.driver.cookies.clear()
+        # headed 模式下会打开浏览器窗口，坐标点击由 CloudflareSolver 内部处理
+        data = await self._cf.run_solver(self._root_url, self._output_file, solver=solver)
+        if data is None:
+            raise RuntimeError("未能获取 cf_clearance，请重试。")
+        return data[self._root_url][-1]
+
+
 def load_cf_info(output_file: str, prefer_domain: str = "bonghwa.co.kr") -> dict:
-    """读取清除脚本输出的 JSON，返回最新条目的信息。"""
-    with open(output_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    """读取清除脚本输出的 JSON，返回最新条目的信息；文件未变动时复用上次的解析结果。"""
+    st = os.stat(output_file)
+    key = (os.path.abspath(output_file), st.st_mtime_ns, st.st_size, prefer_domain)
+    if _CF_CACHE.get('key') == key:
+        return _CF_CACHE['entry']
+
+    with open(output_file, "rb") as f:
+        raw = f.read()
+    data = orjson.loads(raw) if orjson is not None else json.loads(raw)
 
     # 优先选择包含目标域名的键，否则取第一个键
     dom_key = next((k for k in data.keys() if prefer_domain in k), next(iter(data.keys()), None))
     entries = data.get(dom_key, [])
     if not entries:
         raise ValueError(f"输出文件中未找到域名数据：{output_file}")
+    _CF_CACHE['key'] = key
+    _CF_CACHE['entry'] = entries[-1]
     return entries[-1]
 
 
@@ -62,121 +209,213 @@ def make_headers_and_cookies(cf_info: dict) -> tuple[dict, dict]:
         "Accept-Language": "zh-CN,zh;q=0.9",
         "Referer": ROOT_URL,
     }
-    token = cf_info.get("cf_clearance")
+    # 兼容两种条目：直接含 cf_clearance 字段，或清除脚本输出的 cookies 列表
+    token = cf_info.get("cf_clearance") or next(
+        (c.get("value") for c in cf_info.get("cookies", []) if c.get("name") == "cf_clearance"),
+        None,
+    )
     if not token:
         raise ValueError("未从输出中解析到 cf_clearance 值。")
     cookies = {"cf_clearance": token}
     return headers, cookies
 
 
-def is_block_page(text: str) -> bool:
-    tl = text.lower()
-    # 更严格的 Cloudflare 拦截识别，避免 "cdnjs.cloudflare.com" 造成误判
-    keywords = [
-        "attention required",
-        "just a moment",
-        "checking your browser",
-        "please verify you are a human",
-        "cf-error",
-        "captcha",
-    ]
-    return any(k in tl for k in keywords)
+def _on_block_match(*_) -> bool:
+    return True  # 命中任意关键词即终止扫描
+
+
+def is_block_page(html_bytes: bytes) -> bool:
+    if _BLOCK_DB is None:
+        return _BLOCK_RE.search(html_bytes) is not None
+    try:
+        _BLOCK_DB.scan(html_bytes, match_event_handler=_on_block_match)
+    except hyperscan.ScanTerminated:
+        return True
+    return False
 
 
-def fetch_page(url: str, headers: dict, cookies: dict) -> requests.Response:
-    resp = requests.get(url, headers=headers, cookies=cookies, timeout=20)
-    resp.encoding = "utf-8"
-    return resp
+class JsonArrayWriter:
+    """
+    逐条写出 UTF-8 JSON 数组（每行一个条目），内存中只保留当前条目；优先使用 orjson 序列化。
 
+    先写入 path + ".tmp"，正常结束时才替换目标文件；中途出错则删除临时文件，保留上次的结果。
+    """
 
-def extract_items(doc: BeautifulSoup) -> list[dict]:
-    items = []
-    left_divs = doc.select('div.col-lg-9.col-md-8.col-sm-8')
-    for left in left_divs:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.count = 0
+        self._tmp_path = path + ".tmp"
+        self._f = open(self._tmp_path, "wb")
+
+    def __enter__(self) -> "JsonArrayWriter":
+        return self
+
+    def __exit__(self, exc_type, *_) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, item: dict) -> None:
+        self._f.write(b"[\n  " if self.count == 0 else b",\n  ")
+        if orjson is not None:
+            self._f.write(orjson.dumps(item))
+        else:
+            self._f.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self.count += 1
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        self._f.write(b"\n]\n" if self.count else b"[]\n")
+        self._f.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self) -> None:
+        if self._f.closed:
+            return
+        self._f.close()
+        os.remove(self._tmp_path)
+
+
+async def fetch_page(session: aiohttp.ClientSession, cat: int, url: str) -> tuple[int, int, str, bytes]:
+    async with session.get(url) as resp:
+        # 保留原始字节，保存与解析都不再经过 str 解码/编码
+        return cat, resp.status, str(resp.url), await resp.read()
+
+
+async def fetch_all(urls: list[tuple[int, str]], headers: dict, cookies: dict) -> list:
+    """并发抓取多个分类页，返回 (cat, 状态码, 最终URL, HTML字节) 元组；单页失败时对应位置为异常对象。"""
+    connector = aiohttp.TCPConnector(limit=8, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=20)
+    async with aiohttp.ClientSession(
+        headers=headers, cookies=cookies, connector=connector, timeout=timeout
+    ) as session:
+        return await asyncio.gather(
+            *(fetch_page(session, cat, url) for cat, url in urls),
+            return_exceptions=True,
+        )
+
+
+def _joined_text(el, separator: str = ' ') -> str:
+    """拼接元素内各段文本（逐段去除首尾空白），与 get_text(separator=..., strip=True) 一致。"""
+    return separator.join(t for t in (t.strip() for t in _TEXT_XPATH(el)) if t)
+
+
+def iter_items(root: lxml_html.HtmlElement) -> Iterator[dict]:
+    for left in _LEFT_XPATH(root):
         # 分类
-        cat_span = left.find('span', class_='cattxt')
-        category = cat_span.get_text(strip=True) if cat_span else ''
+        cat_span = _CAT_XPATH(left)
+        category = _joined_text(cat_span[0], '') if cat_span else ''
         # 描述文本：去掉“分类 : ”前缀
-        full_text = left.get_text(separator=' ', strip=True)
-        if category:
-            prefix_pattern = re.compile(rf'^{re.escape(category)}\s*:\s*')
-            desc = prefix_pattern.sub('', full_text)
-        else:
-            desc = full_text
+        full_text = _joined_text(left)
+        desc = full_text
+        if category and full_text.startswith(category):
+            rest = full_text[len(category):].lstrip()
+            if rest.startswith(':'):
+                desc = rest[1:].lstrip()
         # 是否新发布标记
-        is_new = bool(left.find('img', src=lambda s: s and 'icn_new' in s))
+        is_new = bool(_NEW_XPATH(left))
         # 右侧电话容器（紧邻的兄弟 div）
-        right = left.find_next_sibling('div', class_='col-lg-3 col-md-4 col-sm-4')
-        phones = []
-        if right:
-            txt = right.get_text(separator=' ', strip=True)
-            phones = re.findall(r'0\d{1,2}-\d{3,4}-\d{4}', txt)
-        # 收集条目
+        right = _RIGHT_XPATH(left)
+        # 逐个文本节点匹配电话，无需先拼接整段文本
+        phones = [m.group(0) for t in _TEXT_XPATH(right[0]) for m in _PHONE_RE.finditer(t)] if right else []
+        # 产出条目
         if desc or phones:
-            items.append({
+            yield {
                 'category': category,
                 'description': desc,
                 'phones': phones,
                 'new': is_new,
-            })
-    return items
+            }
 
 
-def main():
-    # 0) 读取现有 cookie/UA，如无则获取一次
-    headers = None
-    cookies = None
-    try:
-        cf_info = load_cf_info(COOKIES_FILE)
-        headers, cookies = make_headers_and_cookies(cf_info)
-        print("使用已有 cf_clearance 与 UA 进行访问...")
-    except Exception:
-        print("未找到有效的 cookie 文件，先获取一次...")
-        run_cf_clearance_scraper(ROOT_URL, COOKIES_FILE, headed=True, timeout=30)
-        cf_info = load_cf_info(COOKIES_FILE)
-        headers, cookies = make_headers_and_cookies(cf_info)
-
-    # 1) 依次抓取两个分类页；若出现拦截，按需刷新一次后重试
-    refreshed = False
-    for cat, url in LIST_URLS:
+async def main(use_subprocess: bool = False):
+    async with ClearanceRefresher(
+        ROOT_URL, COOKIES_FILE, headed=True, timeout=30, use_subprocess=use_subprocess
+    ) as refresher:
+        # 0) 读取现有 cookie/UA，如无则获取一次
+        try:
+            cf_info = load_cf_info(COOKIES_FILE)
+            headers, cookies = make_headers_and_cookies(cf_info)
+            print("使用已有 cf_clearance 与 UA 进行访问...")
+        except Exception:
+            print("未找到有效的 cookie 文件，先获取一次...")
+            cf_info = await refresher.refresh()
+            headers, cookies = make_headers_and_cookies(cf_info)
+
+        # 1) 并发抓取两个分类页；若有页面被拦截，刷新一次 cf_clearance 后并发重试这些页面
+        results = dict(zip((cat for cat, _ in LIST_URLS), await fetch_all(LIST_URLS, headers, cookies)))
+        blocked_urls = [
+            (cat, url) for cat, url in LIST_URLS
+            if not isinstance(results[cat], Exception)
+            and (results[cat][1] != 200 or is_block_page(results[cat][3]))
+        ]
+        if blocked_urls:
+            print(f"cat={','.join(str(cat) for cat, _ in blocked_urls)} 访问被拦截，触发一次刷新 cf_clearance ...")
+            cf_info = await refresher.refresh()
+            headers, cookies = make_headers_and_cookies(cf_info)
+            # 重试被拦截的页面
+            retried = await fetch_all(blocked_urls, headers, cookies)
+            results.update(zip((cat for cat, _ in blocked_urls), retried))
+
+    for cat, _ in LIST_URLS:
+        result = results[cat]
+        if isinstance(result, Exception):
+            print(f"[cat={cat}] 抓取失败: {result}")
+            continue
+        _, status, final_url, html_bytes = result
         try:
-            resp = fetch_page(url, headers, cookies)
-            blocked = (resp.status_code != 200) or is_block_page(resp.text)
-            if blocked and not refreshed:
-                print(f"cat={cat} 访问被拦截，触发一次刷新 cf_clearance ...")
-                run_cf_clearance_scraper(ROOT_URL, COOKIES_FILE, headed=True, timeout=30)
-                cf_info = load_cf_info(COOKIES_FILE)
-                headers, cookies = make_headers_and_cookies(cf_info)
-                refreshed = True
-                # 重试当前页
-                resp = fetch_page(url, headers, cookies)
             # 输出与保存
-            print(f"[cat={cat}] 状态码: {resp.status_code}, 最终URL: {resp.url}")
-            print(f"[cat={cat}] HTML长度: {len(resp.text)}")
-            html_path = f"listing_cat{cat}.html"
-            with open(html_path, "w", encoding="utf-8") as f:
-                f.write(resp.text)
-            print(f"已保存完整HTML到: {html_path}")
-            # 结构化解析
-            soup = BeautifulSoup(resp.text, "lxml")
-            listings = extract_items(soup)
-            print(f"[cat={cat}] 解析到条目数量: {len(listings)}")
-            for i, it in enumerate(listings[:20], 1):
-                print(f"[{cat}-{i}] 分类: {it['category']}")
-                print(f"    描述: {it['description']}")
-                print(f"    电话: {', '.join(it['phones']) if it['phones'] else '无'}")
+            print(f"[cat={cat}] 状态码: {status}, 最终URL: {final_url}")
+            print(f"[cat={cat}] HTML字节数: {len(html_bytes)}")
+            if SAVE_HTML:
+                html_path = f"listing_cat{cat}.html"
+                Path(html_path).write_bytes(html_bytes)
+                print(f"已保存完整HTML到: {html_path}")
+            # 结构化解析；空响应体 lxml 会报 "Document is empty"，按零条目处理并照常写出空数组
+            if html_bytes.strip():
+                items = iter_items(lxml_html.fromstring(html_bytes, parser=_HTML_PARSER))
+            else:
+                items = iter(())
             json_path = f"listing_cat{cat}.json"
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(listings, f, ensure_ascii=False, indent=2)
-            print(f"已保存结构化数据到: {json_path}")
             # 按分类页关键词过滤并单独导出
             filter_keyword = '아파트임대' if cat == 5 else ('주택임대' if cat == 7 else None)
-            if filter_keyword:
-                filtered = [item for item in listings if item.get('category') == filter_keyword]
-                filtered_path = f"listing_cat{cat}_{filter_keyword}.json"
-                with open(filtered_path, 'w', encoding='utf-8') as f:
-                    json.dump(filtered, f, ensure_ascii=False, indent=2)
-                print(f"已导出“{filter_keyword}”过滤数据到: {filtered_path} (共 {len(filtered)} 条)")
+            filtered_path = f"listing_cat{cat}_{filter_keyword}.json" if filter_keyword else None
+            # 边解析边写出，全量与过滤结果都不在内存中整体保留
+            with contextlib.ExitStack() as stack:
+                writer = stack.enter_context(JsonArrayWriter(json_path))
+                filtered_writer = stack.enter_context(JsonArrayWriter(filtered_path)) if filtered_path else None
+                for i, it in enumerate(items, 1):
+                    writer.write(it)
+                    if i <= 20:
+                        print(f"[{cat}-{i}] 分类: {it['category']}")
+                        print(f"    描述: {it['description']}")
+                        print(f"    电话: {', '.join(it['phones']) if it['phones'] else '无'}")
+                    if filtered_writer is not None and it.get('category') == filter_keyword:
+                        filtered_writer.write(it)
+            print(f"[cat={cat}] 解析到条目数量: {writer.count}")
+            print(f"已保存结构化数据到: {json_path}")
+            if filtered_writer is not None:
+                print(f"已导出“{filter_keyword}”过滤数据到: {filtered_path} (共 {filtered_writer.count} 条)")
+        except Exception as e:
+            print(f"[cat={cat}] 解析失败: {e}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="抓取 Bonghwa cat=5 / cat=7 分类页并导出结构化数据")
+    parser.add_argument(
+        "--subprocess",
+        action="store_true",
+        help="以子进程方式运行 cf-clearance-scraper/main.py 获取 cf_clearance（默认在进程内调用）",
+    )
+    args = parser.parse_args()
+
+    # 进程内调用 run_solver 时，其进度通过 logging 输出，与清除脚本 CLI 的格式保持一致
+    logging.basicConfig(
+        format="[%(asctime)s] [%(levelname)s] %(message)s",
+        datefmt="%H:%M:%S",
+        level=logging.INFO,
+    )
+    logging.getLogger("zendriver").setLevel(logging.WARNING)
+
+    asyncio.run(main(use_subprocess=args.subprocess))
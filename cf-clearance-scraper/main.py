@@ -22,6 +22,9 @@ COMMAND: Final[str] = (
     '{name}: {binary} --header "Cookie: {cookies}" --header "User-Agent: {user_agent}" {url}'
 )
 
+# 挑战复选框在 1920x1080、位于 (0, 0) 的窗口中的屏幕坐标
+CHALLENGE_SCREEN_POINT: Final = (532, 375)
+
 
 def get_chrome_user_agent() -> str:
     """
@@ -90,8 +93,8 @@ class CloudflareSolver:
         if not http3:
             config.add_argument("--disable-quic")
 
-        # 固定窗口大小与位置，便于坐标点击的一致性
-        # 使用 Chrome 启动参数实现窗口尺寸与位置固定
+        # 固定窗口大小与位置，使页面布局稳定；找不到 Turnstile 容器时，
+        # 回退点击点按此窗口位置由屏幕坐标换算为视口坐标（见 _click_challenge）
         config.add_argument("--window-size=1920,1080")
         config.add_argument("--window-position=0,0")
 
@@ -100,14 +103,39 @@ class CloudflareSolver:
 
         self.driver = zendriver.Browser(config)
         self._timeout = timeout
+        self._cf_future: Optional[asyncio.Future[None]] = None
 
     async def __aenter__(self) -> CloudflareSolver:
         await self.driver.start()
+        # 监听响应头中的 Set-Cookie，cf_clearance 一下发即可结束等待
+        await self.driver.main_tab.send(cdp.network.enable())
+        self.driver.main_tab.add_handler(
+            cdp.network.ResponseReceivedExtraInfo, self._on_response_extra_info
+        )
         return self
 
     async def __aexit__(self, *_: Any) -> None:
         await self.driver.stop()
 
+    async def _on_response_extra_info(
+        self, event: cdp.network.ResponseReceivedExtraInfo
+    ) -> None:
+        """
+        Resolve the pending clearance future once a response sets cf_clearance.
+
+        Parameters
+        ----------
+        event : cdp.network.ResponseReceivedExtraInfo
+            The network event carrying the raw response headers.
+        """
+        if self._cf_future is None or self._cf_future.done():
+            return
+
+        for name, value in event.headers.items():
+            if name.lower() == "set-cookie" and "cf_clearance=" in str(value):
+                self._cf_future.set_result(None)
+                return
+
     @staticmethod
     def _format_cookies(cookies: Iterable[Cookie]) -> List[T_JSON_DICT]:
         """
@@ -236,34 +264,239 @@ class CloudflareSolver:
 
         return None
 
+    async def _click_challenge(self) -> None:
+        """Click the challenge checkbox through CDP."""
+        # CDP 的鼠标事件使用视口 CSS 像素：优先点击 Turnstile 容器左侧的复选框；
+        # 找不到容器时，把原先的屏幕坐标减去窗口位置与浏览器工具栏高度
+        # 挑战通过后页面会自动刷新，点击可能落在导航过程中（执行上下文已销毁），
+        # 与原先的系统级点击一样忽略失败，由 solve_challenge 在下一轮重试
+        try:
+            x, y = await self.driver.main_tab.evaluate(
+                """
+                (() => {
+                    const el = document.querySelector(
+                        'iframe[src*="challenges.cloudflare.com"], .cf-turnstile, #turnstile-wrapper'
+                    );
+                    if (el) {
+                        const r = el.getBoundingClientRect();
+                        if (r.width && r.height) {
+                            return [r.left + Math.min(30, r.width / 2), r.top + r.height / 2];
+                        }
+                    }
+                    return [
+                        %d - window.screenX,
+                        %d - window.screenY - (window.outerHeight - window.innerHeight),
+                    ];
+                })()
+                """
+                % CHALLENGE_SCREEN_POINT
+            )
+
+            for event_type in ("mousePressed", "mouseReleased"):
+                await self.driver.main_tab.send(
+                    cdp.input_.dispatch_mouse_event(
+                        type_=event_type,
+                        x=x,
+                        y=y,
+                        button=cdp.input_.MouseButton.LEFT,
+                        click_count=1,
+                    )
+                )
+        except Exception as err:
+            logging.debug("Challenge click failed, retrying next round: %s", err)
+
     async def solve_challenge(self) -> None:
         """Solve the Cloudflare challenge on the current page."""
-        start_timestamp = datetime.now()
-
-        while (
-            self.extract_clearance_cookie(await self.get_cookies()) is None
-            and await self.detect_challenge() is not None
-            and (datetime.now() - start_timestamp).seconds < self._timeout
-        ):
-            # 使用屏幕坐标进行系统级点击，确保与截图坐标一致
-            import ctypes
-            x, y = 532, 375
-            try:
-                ctypes.windll.user32.SetCursorPos(int(x), int(y))
-                ctypes.windll.user32.mouse_event(0x0002, 0, 0, 0, 0)  # 左键按下
-                ctypes.windll.user32.mouse_event(0x0004, 0, 0, 0, 0)  # 左键抬起
-            except Exception:
-                pass
-
-            # 频率：每秒一次
-            await asyncio.sleep(1.0)
-
-            # 每次点击后检查是否已经下发 cf_clearance
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._timeout
+        self._cf_future = loop.create_future()
+
+        try:
             if self.extract_clearance_cookie(await self.get_cookies()) is not None:
-                break
+                return
+
+            challenge_platform = await self.detect_challenge()
+
+            while challenge_platform is not None and loop.time() < deadline:
+                # 挑战组件可能尚未渲染，每秒补点一次，直到 cookie 下发或挑战消失
+                if challenge_platform in (
+                    ChallengePlatform.MANAGED,
+                    ChallengePlatform.INTERACTIVE,
+                ):
+                    await self._click_challenge()
+
+                # Set-Cookie 事件到达即结束等待，无需等满 1 秒
+                await asyncio.wait(
+                    {self._cf_future}, timeout=min(1.0, deadline - loop.time())
+                )
+
+                if self._cf_future.done():
+                    break
+
+                challenge_platform = await self.detect_challenge()
+        finally:
+            self._cf_future = None
+
+
+def format_cookie_header(cookies: Iterable[T_JSON_DICT]) -> str:
+    """
+    Format cookies into the value of a ``Cookie`` request header.
+
+    Parameters
+    ----------
+    cookies : Iterable[T_JSON_DICT]
+        List of JSON cookies.
+
+    Returns
+    -------
+    str
+        The ``name=value`` pairs joined with ``"; "``.
+    """
+    return "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in cookies)
+
+
+async def run_solver(
+    url: str,
+    file: Optional[str] = None,
+    timeout: float = 30,
+    headed: bool = False,
+    proxy: Optional[str] = None,
+    *,
+    user_agent: Optional[str] = None,
+    http2: bool = True,
+    http3: bool = True,
+    solver: Optional[CloudflareSolver] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Scrape the Cloudflare clearance cookie from a URL.
+
+    Parameters
+    ----------
+    url : str
+        The URL to scrape the Cloudflare clearance cookie from.
+    file : Optional[str]
+        The file to write the Cloudflare clearance cookie information to, in JSON format.
+    timeout : float
+        The timeout in seconds to use for solving challenges.
+    headed : bool
+        Run the browser in headed mode.
+    proxy : Optional[str]
+        The proxy server URL to use for the browser requests.
+    user_agent : Optional[str]
+        The user agent to use for the browser requests.
+    http2 : bool
+        Enable or disable the usage of HTTP/2 for the browser requests.
+    http3 : bool
+        Enable or disable the usage of HTTP/3 for the browser requests.
+    solver : Optional[CloudflareSolver]
+        An already started solver to reuse instead of launching a new browser.
+        The browser options above are ignored when it is given.
+
+    Returns
+    -------
+    Optional[Dict[str, Any]]
+        The clearance data keyed by URL, as written to ``file``.
+        Returns None if the cookie could not be retrieved.
+    """
+    if solver is None:
+        logging.info("Launching %s browser...", "headed" if headed else "headless")
+
+        async with CloudflareSolver(
+            user_agent=user_agent,
+            timeout=timeout,
+            http2=http2,
+            http3=http3,
+            headless=not headed,
+            proxy=proxy,
+        ) as solver:
+            return await run_solver(url, file, solver=solver)
+
+    challenge_messages = {
+        ChallengePlatform.JAVASCRIPT: "Solving Cloudflare challenge [JavaScript]...",
+        ChallengePlatform.MANAGED: "Solving Cloudflare challenge [Managed]...",
+        ChallengePlatform.INTERACTIVE: "Solving Cloudflare challenge [Interactive]...",
+    }
+
+    logging.info("Going to %s...", url)
+
+    try:
+        await solver.driver.get(url)
+    except asyncio.TimeoutError as err:
+        logging.error(err)
+        return None
+
+    all_cookies = await solver.get_cookies()
+    clearance_cookie = solver.extract_clearance_cookie(all_cookies)
+
+    if clearance_cookie is None:
+        await solver.set_user_agent_metadata(await solver.get_user_agent())
+        challenge_platform = await solver.detect_challenge()
+
+        if challenge_platform is None:
+            logging.error("No Cloudflare challenge detected.")
+            return None
+
+        logging.info(challenge_messages[challenge_platform])
+        await solver.solve_challenge()
+
+        all_cookies = await solver.get_cookies()
+        clearance_cookie = solver.extract_clearance_cookie(all_cookies)
+
+    if clearance_cookie is None:
+        logging.error("Failed to retrieve the Cloudflare clearance cookie. Try again.")
+        return None
+
+    logging.info("Retrieved the Cloudflare clearance cookie!")
+
+    # 直接复用上面取得的 all_cookies，UA 也只取一次，下面各输出共用
+    final_user_agent = await solver.get_user_agent()
+
+    logging.info(
+        COMMAND.format(
+            name="curl",
+            binary="curl",
+            cookies=format_cookie_header(all_cookies),
+            user_agent=final_user_agent,
+            url=url,
+        )
+    )
+
+    now = datetime.now(timezone.utc)
+
+    expires = datetime.fromtimestamp(clearance_cookie["expires"] / 1000, timezone.utc)
+    delta = expires - now
+
+    if delta.days > 1:
+        expires_str = expires.strftime("%B %d, %Y at %H:%M %p %Z")
+    else:
+        hours, remainder = divmod(delta.seconds, 3600)
+        minutes, seconds = divmod(remainder, 60)
+
+        expires_str = f"{hours} hours, {minutes} minutes and {seconds} seconds"
+
+    data: Dict[str, Any] = {
+        url: [
+            {
+                "cookies": [clearance_cookie],
+                "user_agent": final_user_agent,
+                "expires": expires_str,
+            },
+            {
+                "cookies": all_cookies,
+                "user_agent": final_user_agent,
+                "expires": expires_str,
+            },
+        ]
+    }
+
+    if file is not None:
+        with open(file, "w") as f:
+            json.dump(data, f)
+
+    return data
 
 
-async def main() -> None:
+async def _cli_main() -> None:
     parser = argparse.ArgumentParser(
         description="A simple program for scraping Cloudflare clearance (cf_clearance) cookies from websites issuing Cloudflare challenges to visitors"
     )
@@ -362,153 +595,60 @@ async def main() -> None:
     )
 
     logging.getLogger("zendriver").setLevel(logging.WARNING)
-    logging.info("Launching %s browser...", "headed" if args.headed else "headless")
-
-    challenge_messages = {
-        ChallengePlatform.JAVASCRIPT: "Solving Cloudflare challenge [JavaScript]...",
-        ChallengePlatform.MANAGED: "Solving Cloudflare challenge [Managed]...",
-        ChallengePlatform.INTERACTIVE: "Solving Cloudflare challenge [Interactive]...",
-    }
-
-    user_agent = get_chrome_user_agent() if args.user_agent is None else args.user_agent
 
-    async with CloudflareSolver(
-        user_agent=user_agent,
-        timeout=args.timeout,
+    data = await run_solver(
+        args.url,
+        args.file,
+        args.timeout,
+        args.headed,
+        args.proxy,
+        user_agent=get_chrome_user_agent() if args.user_agent is None else args.user_agent,
         http2=not args.disable_http2,
         http3=not args.disable_http3,
-        headless=not args.headed,
-        proxy=args.proxy,
-    ) as solver:
-        logging.info("Going to %s...", args.url)
-
-        try:
-            await solver.driver.get(args.url)
-        except asyncio.TimeoutError as err:
-            logging.error(err)
-            return
-
-        all_cookies = await solver.get_cookies()
-        clearance_cookie = solver.extract_clearance_cookie(all_cookies)
-
-        if clearance_cookie is None:
-            await solver.set_user_agent_metadata(await solver.get_user_agent())
-            challenge_platform = await solver.detect_challenge()
-
-            if challenge_platform is None:
-                logging.error("No Cloudflare challenge detected.")
-                return
+    )
 
-            logging.info(challenge_messages[challenge_platform])
-            await solver.solve_challenge()
+    if data is None:
+        return
 
-            all_cookies = await solver.get_cookies()
-            clearance_cookie = solver.extract_clearance_cookie(all_cookies)
+    # 第二个条目包含全部 cookie，与 CLI 各输出分支所需一致
+    final_entry = data[args.url][-1]
+    cookies_header = format_cookie_header(final_entry["cookies"])
 
-        if clearance_cookie is None:
-            logging.error("Failed to retrieve the Cloudflare clearance cookie. Try again.")
-            return
+    if args.all_cookies:
+        print(json.dumps({args.url: [final_entry]}))
 
-        logging.info("Retrieved the Cloudflare clearance cookie!")
-        logging.info(
+    if args.curl:
+        print(
             COMMAND.format(
                 name="curl",
                 binary="curl",
-                cookies="; ".join(
-                    f"{cookie['name']}={cookie['value']}" for cookie in await solver.driver.cookies.get_all()
-                ),
-                user_agent=await solver.get_user_agent(),
+                cookies=cookies_header,
+                user_agent=final_entry["user_agent"],
                 url=args.url,
             )
         )
 
-        now = datetime.now(timezone.utc)
-
-        expires = datetime.fromtimestamp(clearance_cookie["expires"] / 1000, timezone.utc)
-        delta = expires - now
-
-        if delta.days > 1:
-            expires_str = expires.strftime("%B %d, %Y at %H:%M %p %Z")
-        else:
-            hours, remainder = divmod(delta.seconds, 3600)
-            minutes, seconds = divmod(remainder, 60)
-
-            expires_str = f"{hours} hours, {minutes} minutes and {seconds} seconds"
-
-        additional_cookies = [cookie.to_json() for cookie in await solver.driver.cookies.get_all()]
-
-        data: Dict[str, Any] = {
-            args.url: [
-                {
-                    "cookies": [clearance_cookie],
-                    "user_agent": await solver.get_user_agent(),
-                    "expires": expires_str,
-                },
-                {
-                    "cookies": additional_cookies,
-                    "user_agent": await solver.get_user_agent(),
-                    "expires": expires_str,
-                },
-            ]
-        }
-
-        if args.file is not None:
-            with open(args.file, "w") as file:
-                json.dump(data, file)
-
-        if args.all_cookies:
-            _cookies = [cookie.to_json_dict() for cookie in await solver.driver.cookies.get_all()]
-
-            data = {
-                args.url: [
-                    {
-                        "cookies": _cookies,
-                        "user_agent": await solver.get_user_agent(),
-                        "expires": expires_str,
-                    }
-                ]
-            }
-
-            print(json.dumps(data))
-
-        if args.curl:
-            print(
-                COMMAND.format(
-                    name="curl",
-                    binary="curl",
-                    cookies="; ".join(
-                        f"{cookie['name']}={cookie['value']}" for cookie in await solver.driver.cookies.get_all()
-                    ),
-                    user_agent=await solver.get_user_agent(),
-                    url=args.url,
-                )
-            )
-
-        if args.wget:
-            print(
-                COMMAND.format(
-                    name="Wget",
-                    binary="wget",
-                    cookies="; ".join(
-                        f"{cookie['name']}={cookie['value']}" for cookie in await solver.driver.cookies.get_all()
-                    ),
-                    user_agent=await solver.get_user_agent(),
-                    url=args.url,
-                )
+    if args.wget:
+        print(
+            COMMAND.format(
+                name="Wget",
+                binary="wget",
+                cookies=cookies_header,
+                user_agent=final_entry["user_agent"],
+                url=args.url,
             )
+        )
 
-        if args.aria2:
-            print(
-                COMMAND.format(
-                    name="aria2",
-                    binary="aria2c",
-                    cookies="; ".join(
-                        f"{cookie['name']}={cookie['value']}" for cookie in await solver.driver.cookies.get_all()
-                    ),
-                    user_agent=await solver.get_user_agent(),
-                    url=args.url,
-                )
+    if args.aria2:
+        print(
+            COMMAND.format(
+                name="aria2",
+                binary="aria2c",
+                cookies=cookies_header,
+                user_agent=final_entry["user_agent"],
+                url=args.url,
             )
+        )
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(_cli_main())
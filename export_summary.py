@@ -1,19 +1,37 @@
 import os
 import json
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时退回标准库 json
+    orjson = None
 
 
 BASE_DIR = os.path.dirname(__file__)
 FILE_CAT7 = os.path.join(BASE_DIR, 'listing_cat7_주택임대.json')
 FILE_CAT5 = os.path.join(BASE_DIR, 'listing_cat5_아파트임대.json')
 OUTPUT_TXT = os.path.join(BASE_DIR, '임대汇总.txt')
+_JSON_CACHE: dict = {}  # path -> (mtime_ns, size, data)
+BLOCK_TITLES = {7: '주택임대', 5: '아파트임대'}
 
 
 def load_json(path: str) -> list:
-    if not os.path.exists(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
         return []
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    cached = _JSON_CACHE.get(path)
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
+    with open(path, 'rb') as f:
+        raw = f.read()
+    data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    _JSON_CACHE[path] = (st.st_mtime_ns, st.st_size, data)
+    return data
 
 
 def format_entry(idx: int, item: dict, cat: int) -> str:
@@ -21,46 +39,43 @@ def format_entry(idx: int, item: dict, cat: int) -> str:
     description = item.get('description') or ''
     phones = ', '.join(item.get('phones') or []) if item.get('phones') else '无'
     is_new = '是' if item.get('new') else '否'
-    lines = [
-        f"[{cat}-{idx}] 分类: {category}",
-        f"    描述: {description}",
-        f"    电话: {phones}",
-        f"    新发布: {is_new}",
-    ]
-    return '\n'.join(lines)
+    return (
+        f"[{cat}-{idx}] 分类: {category}\n"
+        f"    描述: {description}\n"
+        f"    电话: {phones}\n"
+        f"    新发布: {is_new}"
+    )
 
 
-def build_document(cat7_items: list, cat5_items: list) -> str:
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    parts = [
-        f"임대汇总文档", 
-        f"生成时间: {now}",
-        "",
-        "==== 주택임대 (cat=7) ===="
-    ]
-    if cat7_items:
-        parts.append(f"总计: {len(cat7_items)} 条")
-        for i, item in enumerate(cat7_items, 1):
-            parts.append(format_entry(i, item, 7))
+def _iter_block_lines(items: list, cat: int):
+    yield f"==== {BLOCK_TITLES[cat]} (cat={cat}) ===="
+    if items:
+        yield f"总计: {len(items)} 条"
+        for i, item in enumerate(items, 1):
+            yield format_entry(i, item, cat)
     else:
-        parts.append("无数据")
-    parts.extend(["", "==== 아파트임대 (cat=5) ===="])
-    if cat5_items:
-        parts.append(f"总计: {len(cat5_items)} 条")
-        for i, item in enumerate(cat5_items, 1):
-            parts.append(format_entry(i, item, 5))
-    else:
-        parts.append("无数据")
-    parts.append("")
-    return '\n'.join(parts)
+        yield "无数据"
+
+
+def build_block(items: list, cat: int) -> str:
+    return '\n'.join(_iter_block_lines(items, cat))
+
+
+def build_document(cat7_items: list, cat5_items: list, executor: Optional[Executor] = None) -> str:
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    header = f"임대汇总文档\n生成时间: {now}\n"
+    # 两个分类块互不依赖，传入 executor 时并行生成
+    mapper = executor.map if executor is not None else map
+    block7, block5 = mapper(build_block, (cat7_items, cat5_items), (7, 5))
+    return '\n'.join((header, block7, "", block5, ""))
 
 
 def main():
-    cat7 = load_json(FILE_CAT7)
-    cat5 = load_json(FILE_CAT5)
-    doc = build_document(cat7, cat5)
-    with open(OUTPUT_TXT, 'w', encoding='utf-8') as f:
-        f.write(doc)
+    # 两个文件的读取与两个分类块的生成均互不依赖，共用一个线程池
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        cat7, cat5 = executor.map(load_json, (FILE_CAT7, FILE_CAT5))
+        doc = build_document(cat7, cat5, executor)
+    Path(OUTPUT_TXT).write_bytes(doc.encode('utf-8'))
     print(f"已生成汇总文档: {OUTPUT_TXT}")
     print(f"cat=7 条目: {len(cat7)} 条, cat=5 条目: {len(cat5)} 条")
 